@@ -1,14 +1,11 @@
 CREATE INDEX IF NOT EXISTS idx_top100lists_lookup ON Top100Lists (platform, title, date);
 CREATE INDEX IF NOT EXISTS idx_podcasts_title ON Podcasts (title);
 -------------------------------------------------------------------------------------
+DROP VIEW IF EXISTS vw_CurrentPodcastDetailsWithCategories; -- Recreate so existing databases pick up the definition below
 CREATE VIEW IF NOT EXISTS vw_CurrentPodcastDetailsWithCategories AS
-WITH LatestRank AS (
-    -- Step 1: Find the most recent date in the Top100Lists table
-    SELECT MAX(date) as latest_date
-    FROM Top100Lists
-),
-CurrentTop100 AS (
-    -- Step 2: Get the Top 100 entries only for that latest date
+WITH CurrentTop100 AS (
+    -- Step 1-2: Get the Top 100 entries only for the most recent date.
+    -- A scalar MAX(date) subquery lets SQLite read both the max and the matching rows from the date index.
     SELECT
         t100.platform,
         t100.rank,
@@ -16,7 +13,7 @@ CurrentTop100 AS (
         t100.platform_podcast_id,
         t100.date
     FROM Top100Lists t100
-    JOIN LatestRank lr ON t100.date = lr.latest_date
+    WHERE t100.date = (SELECT MAX(date) FROM Top100Lists)
 )
 -- Step 3: Join the current Top 100 list with Podcast details and Categories
 SELECT
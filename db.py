@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import logging
+from typing import List, Optional, Tuple
+
+# One chart row in Top100Lists column order: (platform, rank, title, platform_podcast_id, date)
+ChartRecord = Tuple[str, int, Optional[str], Optional[str], str]
+
+# --- Schema ---
+# Each entry upgrades the schema by one version. PRAGMA user_version records how many
+# have been applied, so bootstrap_db only runs the ones a database hasn't seen yet.
+# Never edit an entry once released; append a new one instead.
+SCHEMA_MIGRATIONS = [
+    # 1: Chart history plus the indexes used by the views
+    '''
+    CREATE TABLE IF NOT EXISTS Top100Lists (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        platform TEXT NOT NULL,
+        rank INTEGER NOT NULL,
+        title TEXT,
+        platform_podcast_id TEXT,
+        date TEXT NOT NULL,
+        UNIQUE(platform, rank, date)
+    );
+    CREATE INDEX IF NOT EXISTS ix_top100_platform_date ON Top100Lists(platform, date);
+    CREATE INDEX IF NOT EXISTS ix_top100_id_date ON Top100Lists(platform_podcast_id, date);
+    ''',
+    # 2: Date-leading index so MAX(date) and "date = latest" lookups in the views don't scan the table
+    '''
+    CREATE INDEX IF NOT EXISTS ix_top100_date ON Top100Lists(date);
+    ''',
+    # 3: Partial title index covering update_podcast_details' SELECT DISTINCT title scan
+    '''
+    CREATE INDEX IF NOT EXISTS ix_top100_title ON Top100Lists(title) WHERE title IS NOT NULL AND title != '';
+    ''',
+]
+
+
+def connect(db_path: str, **kwargs) -> sqlite3.Connection:
+    """
+    Opens a SQLite connection configured for the pipeline.
+
+    File databases are switched to WAL mode with synchronous=NORMAL, so the scrapers and the
+    sheet export can read and write at the same time without "database is locked" errors.
+
+    Args:
+        db_path: The full path to the SQLite database file (or ":memory:").
+        **kwargs: Passed through to sqlite3.connect.
+
+    Returns:
+        The open connection.
+    """
+    conn = sqlite3.connect(db_path, **kwargs)
+    if db_path != ":memory:":
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000") # Wait up to 30s on a locked DB instead of failing
+        conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def bootstrap_db(db_path: str):
+    """
+    Creates or upgrades the shared schema in the given database.
+
+    Cheap to call on every run: once the database is current it only reads PRAGMA user_version.
+
+    Args:
+        db_path: The full path to the SQLite database file.
+    """
+    conn = connect(db_path)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target_version, script in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+            # Apply the step and bump the version in one transaction so a failure leaves nothing half-done
+            conn.executescript(f"BEGIN; {script} PRAGMA user_version = {target_version}; COMMIT;")
+            logging.info("Upgraded database schema to version %s: %s", target_version, db_path)
+    finally:
+        conn.close()
+
+
+def has_chart_for_date(db_path: str, platform: str, date: str) -> bool:
+    """
+    Checks whether Top100Lists already holds that platform's chart for the given date.
+
+    The scrapers call this before sending conditional (ETag) requests: a 304 is only safe to act on
+    once the day's snapshot is really stored, not just downloaded.
+
+    Args:
+        db_path: The full path to the SQLite database file.
+        platform: Platform name as stored in Top100Lists (e.g. 'Apple').
+        date: The chart date (YYYY-MM-DD).
+
+    Returns:
+        True if at least one row exists; False if none do or the database can't be read.
+    """
+    if not os.path.exists(db_path):
+        return False # Don't let the check create an empty database file
+
+    conn = None
+    try:
+        conn = connect(db_path)
+        row = conn.execute(
+            "SELECT 1 FROM Top100Lists WHERE platform = ? AND date = ? LIMIT 1", (platform, date)
+        ).fetchone()
+        return row is not None
+    except sqlite3.Error as e:
+        logging.warning("Could not check for today's %s chart in %s: %s", platform, db_path, e)
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+def insert_chart_records(conn: sqlite3.Connection, records: List[ChartRecord]) -> Tuple[int, int]:
+    """
+    Inserts chart rows into Top100Lists, ignoring rows already stored for that platform/rank/date.
+
+    Runs as one executemany; the caller owns the transaction (wrap the call in 'with conn:').
+
+    Args:
+        conn: An open connection to a bootstrapped database.
+        records: A list of ChartRecord tuples.
+
+    Returns:
+        A (inserted, ignored) tuple of row counts.
+    """
+    changes_before = conn.total_changes
+    conn.executemany('''
+        INSERT OR IGNORE INTO Top100Lists(platform, rank, title, platform_podcast_id, date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', records)
+    inserted = conn.total_changes - changes_before
+    return inserted, len(records) - inserted
@@ -0,0 +1,60 @@
+import requests
+import datetime
+import json
+import logging
+from typing import Dict
+
+# Conditional-request helpers shared by the chart scrapers. Each scraper keeps its own sidecar
+# JSON file (ETag / Last-Modified of its last successful download) and passes its path in.
+
+
+def load_cache_validators(cache_path: str, url: str) -> Dict[str, str]:
+    """
+    Builds conditional-request headers (If-None-Match / If-Modified-Since) from the sidecar file.
+
+    Validators saved on an earlier day (or for a different URL) are ignored, so the first scrape
+    of each day always downloads and stores that day's chart even if it hasn't changed.
+
+    Args:
+        cache_path: Path to the sidecar JSON file written by save_cache_validators.
+        url: The chart URL about to be requested.
+
+    Returns:
+        A dict of request headers, empty if there is nothing usable cached.
+    """
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(cached, dict) or cached.get("url") != url or cached.get("date") != str(datetime.date.today()):
+        return {}
+
+    headers = {}
+    if cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+def save_cache_validators(cache_path: str, url: str, response: requests.Response):
+    """
+    Stores the response's ETag / Last-Modified headers so a later scrape today can skip an unchanged chart.
+
+    Args:
+        cache_path: Path to the sidecar JSON file.
+        url: The chart URL that was requested.
+        response: The successful (200) chart response.
+    """
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return # Server doesn't support conditional requests; nothing to cache
+
+    try:
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "date": str(datetime.date.today()), "etag": etag, "last_modified": last_modified}, f)
+    except OSError as e:
+        logging.warning("Could not write cache validators to %s: %s", cache_path, e)
@@ -0,0 +1,60 @@
+import logging
+import sqlite3
+import sys
+
+# Import update_gsheet first: its logging setup (log file + stdout) is the one that takes effect,
+# and the scrapers' basicConfig calls then become no-ops instead of adding a second console handler.
+from update_gsheet import authorize_gspread, update_multiple_google_sheets, GOOGLE_SHEET_ID, QUERY_CONFIGS, KEY_FILE_PATH
+from scrape_all import scrape_all_charts
+from scrape_apple_top100 import DB_PATH
+from db import bootstrap_db, connect, insert_chart_records
+
+
+def run_pipeline(db_path: str, sheet_id: str, query_configs: list, key_file_path: str):
+    """
+    Runs scrape -> save -> sheet upload in one process.
+
+    The Apple and Spotify charts are fetched concurrently and saved in a single transaction, then
+    the same SQLite connection and one gspread client are reused for the Google Sheets export.
+
+    Args:
+        db_path: The full path to the SQLite database file.
+        sheet_id: The ID of the Google Sheet.
+        query_configs: A list of dictionaries, each containing 'query' and 'worksheet_name'.
+        key_file_path: Path to the Google service account JSON key file.
+    """
+    conn = None
+    try:
+        bootstrap_db(db_path)
+        conn = connect(db_path, isolation_level="IMMEDIATE")
+
+        # --- Scrape both charts and save them together ---
+        records = scrape_all_charts(db_path)
+        if records:
+            with conn:
+                insert_count, ignore_count = insert_chart_records(conn, records)
+            logging.info("Saved chart data. Inserted: %s, Ignored (duplicates): %s into %s", insert_count, ignore_count, db_path)
+        else:
+            logging.warning("Both scrapers returned no data. Nothing saved; the sheets will still be refreshed.")
+
+        # --- Push the views to Google Sheets over the same connection ---
+        try:
+            gc = authorize_gspread(key_file_path)
+        except Exception as e:
+            logging.error("Google authentication failed, skipping sheet update: %s", e)
+            return
+        update_multiple_google_sheets(db_path, sheet_id, query_configs, key_file_path, conn=conn, gc=gc)
+
+    except sqlite3.Error as e:
+        logging.error("Database error accessing %s: %s", db_path, e)
+    finally:
+        if conn:
+            conn.close()
+            logging.info("Database connection closed.")
+
+
+if __name__ == "__main__":
+    logging.info("Starting podcast chart pipeline...")
+    run_pipeline(DB_PATH, GOOGLE_SHEET_ID, QUERY_CONFIGS, KEY_FILE_PATH)
+    logging.info("Pipeline finished.")
+    sys.exit(0)
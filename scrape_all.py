@@ -0,0 +1,47 @@
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+# Both scraper modules configure logging and ensure the data directory on import
+from db import ChartRecord
+from scrape_apple_top100 import scrape_apple_top_podcasts, save_chart_data_to_db, DB_PATH
+from scrape_spotify_top100 import scrape_spotify_top100
+
+
+def scrape_all_charts(db_path: str = DB_PATH) -> List[ChartRecord]:
+    """
+    Fetches the Apple and Spotify charts concurrently.
+
+    Both scrapers spend almost all of their time waiting on the network, so running
+    them in two threads makes the total wait roughly max(apple, spotify) instead of the sum.
+
+    Args:
+        db_path: Database the results will be saved to (passed to the scrapers' conditional-request check).
+
+    Returns:
+        The Apple records followed by the Spotify records (either part may be empty on failure).
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future_apple = executor.submit(scrape_apple_top_podcasts, db_path=db_path)
+        future_spotify = executor.submit(scrape_spotify_top100, db_path=db_path)
+        apple_records = future_apple.result()
+        spotify_records = future_spotify.result()
+
+    logging.info("Scraped %s Apple rows and %s Spotify rows.", len(apple_records), len(spotify_records))
+    return apple_records + spotify_records
+
+
+if __name__ == "__main__":
+    logging.info("Starting combined Apple + Spotify Top 100 scrape...")
+    scraped_data = scrape_all_charts()
+
+    if scraped_data:
+        # Save both platforms in one transaction
+        save_chart_data_to_db(scraped_data, DB_PATH)
+        logging.info("Attempted to save %s chart rows to %s.", len(scraped_data), DB_PATH)
+    else:
+        logging.warning("Both scrapers returned no data. Nothing saved.")
+
+    logging.info("Script finished.")
+    sys.exit(0)
@@ -1,10 +1,15 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import datetime
 import sqlite3
 import json
+import orjson
 import logging
 import os 
 import sys
+from db import ChartRecord, bootstrap_db, connect, has_chart_for_date, insert_chart_records
+from http_cache import load_cache_validators, save_cache_validators
 from typing import List, Dict, Optional, Any
 
 # --- Configuration ---
@@ -18,6 +23,20 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data') # Define data directory path
 DB_FILENAME = "podcasts.db"
 DB_PATH = os.path.join(DATA_DIR, DB_FILENAME) # Full path to the database
+# Sidecar file holding the ETag/Last-Modified of the last successful chart download
+CACHE_VALIDATORS_PATH = os.path.join(DATA_DIR, '.apple_etag.json')
+
+# Connect/read timeouts (seconds) for the chart request
+REQUEST_TIMEOUT = (3.05, 15)
+
+# Shared HTTP session: keeps the TLS connection alive between requests and retries transient 5xx errors
+SESSION = requests.Session()
+SESSION.headers.update({"Accept-Encoding": "gzip", "User-Agent": "podcast-dashboard/1.0"})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
 
 LOG_LEVEL = logging.INFO
 
@@ -33,37 +52,50 @@ logging.basicConfig(
 # *** Create the data directory if it doesn't exist ***
 try:
     os.makedirs(DATA_DIR, exist_ok=True) # exist_ok=True prevents error if dir already exists
-    logging.info(f"Ensured data directory exists: {DATA_DIR}")
+    logging.info("Ensured data directory exists: %s", DATA_DIR)
 except OSError as e:
-    logging.error(f"Error creating data directory {DATA_DIR}: {e}")
+    logging.error("Error creating data directory %s: %s", DATA_DIR, e)
     # Decide if you want to exit or continue without saving
     # exit(1) # Uncomment to exit if directory creation fails
 
 
 def scrape_apple_top_podcasts(
     region: str = DEFAULT_APPLE_REGION,
-    limit: int = DEFAULT_LIMIT
-) -> List[Dict[str, Any]]:
+    limit: int = DEFAULT_LIMIT,
+    db_path: str = DB_PATH
+) -> List[ChartRecord]:
     """
     Scrapes the top podcasts from Apple's public RSS feed generator API for a given region.
 
     Args:
         region: The two-letter country code for the chart region (e.g., 'us', 'gb').
         limit: The number of top podcasts to fetch (e.g., 100).
+        db_path: Database the results will be saved to; checked for today's chart before a conditional request.
 
     Returns:
-        A list of dictionaries, each representing a podcast entry, or an empty list on failure.
+        A list of ChartRecord tuples, one per podcast entry, or an empty list on failure.
     """
     url = APPLE_API_BASE_URL_TEMPLATE.format(region=region, limit=limit)
-    logging.info(f"Requesting Apple chart data from: {url}")
+    logging.info("Requesting Apple chart data from: %s", url)
     records = []
+    today = str(datetime.date.today())
+    # The validators are saved before the caller stores the rows, so only ask for a 304 once today's
+    # chart is actually in the database; if that save failed, download the chart again in full
+    conditional_headers = {}
+    if has_chart_for_date(db_path, PLATFORM_NAME_APPLE, today):
+        conditional_headers = load_cache_validators(CACHE_VALIDATORS_PATH, url)
     try:
-        response = requests.get(url, timeout=15) # Increased timeout slightly
-        logging.info(f"HTTP status: {response.status_code}")
-        logging.debug(f"Response snippet: {response.text[:200]}...")
+        response = SESSION.get(url, headers=conditional_headers, timeout=REQUEST_TIMEOUT)
+        logging.info("HTTP status: %s", response.status_code)
+        # response.text decodes the whole body, so only build the snippet when debug logging is on
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Response snippet: %s...", response.text[:200])
+        if response.status_code == 304:
+            logging.info("Apple chart unchanged since the last scrape today (HTTP 304). Nothing new to save.")
+            return []
         response.raise_for_status()
 
-        data = response.json()
+        data = orjson.loads(response.content)
 
         feed_data = data.get("feed")
         if not feed_data or not isinstance(feed_data, dict):
@@ -75,45 +107,45 @@ def scrape_apple_top_podcasts(
              logging.error("API response missing 'results' list within 'feed' or it's not a list.")
              return []
 
-        logging.info(f"Parsed {len(results)} items from API response.")
-        today = str(datetime.date.today())
+        logging.info("Parsed %s items from API response.", len(results))
 
-        for i, pod_data in enumerate(results[:limit]):
-             if not isinstance(pod_data, dict):
-                  logging.warning(f"Skipping item at index {i}, expected dict, got {type(pod_data)}")
-                  continue
+        platform = PLATFORM_NAME_APPLE # Local name, looked up once rather than per row
+        chart_items = results[:limit]
+        records = [
+            (platform, i + 1, pod_data.get("name"), pod_data.get("id"), today)
+            for i, pod_data in enumerate(chart_items)
+            if isinstance(pod_data, dict)
+        ]
+        if len(records) < len(chart_items):
+            logging.warning("Skipped %s items that were not dicts.", len(chart_items) - len(records))
 
-             records.append({
-                 "platform": PLATFORM_NAME_APPLE,
-                 "rank": i + 1,
-                 "title": pod_data.get("name"),
-                 "platform_podcast_id": pod_data.get("id"),
-                 "date": today
-             })
+        if records:
+            save_cache_validators(CACHE_VALIDATORS_PATH, url, response)
 
     except requests.exceptions.Timeout:
-        logging.error(f"Request timed out connecting to {url}")
+        logging.error("Request timed out connecting to %s", url)
         return []
     except requests.exceptions.RequestException as e:
-        logging.error(f"HTTP Request failed: {e}")
+        logging.error("HTTP Request failed: %s", e)
         return []
-    except json.JSONDecodeError as e:
-        logging.error(f"Failed to decode JSON response: {e}")
-        logging.debug(f"Response text: {response.text[:500]}...")
+    except (json.JSONDecodeError, orjson.JSONDecodeError) as e:
+        logging.error("Failed to decode JSON response: %s", e)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Response text: %s...", response.text[:500])
         return []
     except Exception as e:
-        logging.error(f"An unexpected error occurred during scraping: {e}")
+        logging.error("An unexpected error occurred during scraping: %s", e)
         return []
 
     return records
 
 
-def save_chart_data_to_db(records: List[Dict[str, Any]], db_path: str):
+def save_chart_data_to_db(records: List[ChartRecord], db_path: str):
     """
     Saves scraped podcast chart records to the specified SQLite database file.
 
     Args:
-        records: A list of podcast record dictionaries.
+        records: A list of ChartRecord tuples (platform, rank, title, platform_podcast_id, date).
         db_path: The full path to the SQLite database file.
     """
     if not records:
@@ -123,60 +155,31 @@ def save_chart_data_to_db(records: List[Dict[str, Any]], db_path: str):
     # Check if the directory exists before trying to connect
     db_dir = os.path.dirname(db_path)
     if not os.path.exists(db_dir):
-        logging.error(f"Database directory does not exist: {db_dir}. Cannot save data.")
+        logging.error("Database directory does not exist: %s. Cannot save data.", db_dir)
         return
 
     conn = None # Initialize conn to None
     try:
-        # *** Connect using the provided db_path ***
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        # *** Use standard SQLite syntax for CREATE TABLE ***
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Top100Lists (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                platform TEXT NOT NULL,
-                rank INTEGER NOT NULL,
-                title TEXT,
-                platform_podcast_id TEXT,
-                date TEXT NOT NULL,
-                UNIQUE(platform, rank, date)
-            )
-        ''')
-
-        insert_count = 0
-        ignore_count = 0
-        first_platform = records[0]['platform'] if records else 'Unknown' # Get platform for logging
-
-        for r in records:
-            required_keys = ["platform", "rank", "date"]
-            if not all(key in r for key in required_keys):
-                 logging.error(f"Record missing required keys: {r}. Skipping.")
-                 continue
-            try:
-                # *** Use standard SQLite syntax for INSERT OR IGNORE ***
-                cursor.execute('''
-                    INSERT OR IGNORE INTO Top100Lists(platform, rank, title, platform_podcast_id, date)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (r["platform"], r["rank"], r.get("title"), r.get("platform_podcast_id"), r["date"]))
-                if cursor.rowcount > 0:
-                    insert_count += 1
-                else:
-                    ignore_count += 1
-            except sqlite3.Error as e:
-                 logging.error(f"Failed to insert record: {r} - Error: {e}")
-
-        conn.commit() # Commit changes after the loop
-        logging.info(f"Database operation complete for {first_platform} data. Inserted: {insert_count}, Ignored (duplicates): {ignore_count} into {db_path}")
+        # Create/upgrade the shared schema (a no-op once the DB is current)
+        bootstrap_db(db_path)
+        # IMMEDIATE: take the write lock when the transaction begins, so the insert below never
+        # has to upgrade a read lock while the other scraper is writing
+        conn = connect(db_path, isolation_level="IMMEDIATE")
+
+        platforms = ", ".join(sorted({r[0] for r in records})) # Platform(s) for logging
+
+        # One BEGIN IMMEDIATE ... COMMIT for the whole batch; 'with conn' commits, or rolls back on error
+        with conn:
+            insert_count, ignore_count = insert_chart_records(conn, records)
+
+        logging.info("Database operation complete for %s data. Inserted: %s, Ignored (duplicates): %s into %s", platforms, insert_count, ignore_count, db_path)
 
     except sqlite3.Error as e:
-        logging.error(f"Database error accessing {db_path}: {e}")
-        if conn:
-            conn.rollback() # Roll back changes if error occurs during transaction
+        logging.error("Database error accessing %s: %s", db_path, e)
     finally:
         if conn:
             conn.close() # Ensure connection is closed
-            logging.debug(f"Database connection closed for {db_path}")
+            logging.debug("Database connection closed for %s", db_path)
 
 
 if __name__ == "__main__":
@@ -186,7 +189,7 @@ if __name__ == "__main__":
     if scraped_data_apple:
         # *** Pass the specific DB_PATH to the save function ***
         save_chart_data_to_db(scraped_data_apple, DB_PATH)
-        logging.info(f"Attempted to save {len(scraped_data_apple)} Apple Podcasts rows to {DB_PATH}.")
+        logging.info("Attempted to save %s Apple Podcasts rows to %s.", len(scraped_data_apple), DB_PATH)
     else:
         logging.warning("Apple Podcasts scraping returned no data. Nothing saved.")
 
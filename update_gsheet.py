@@ -1,12 +1,12 @@
 import sqlite3
 import gspread
+import requests # Only for requests.exceptions.InvalidJSONError raised through gspread
 from google.oauth2.service_account import Credentials
-import pandas as pd
 import os
 import logging
 import sys 
-import math 
 from datetime import datetime
+from db import connect
 
 # --- Configuration ---
 # Path to service account key JSON file
@@ -21,6 +21,19 @@ GOOGLE_SHEET_ID = "1-bPweWPzKlY-h4YjCzN4x7S0comscrvz_hQbErqc8ek"
 # Cell to start writing data in each sheet 
 START_CELL = "A1"
 
+# How Sheets should store uploaded values. 'RAW' writes them exactly as read from the database
+# (titles starting with '=', '+' or '-' stay text). Add "value_input_option": "USER_ENTERED"
+# to a query config below if that worksheet needs Sheets to parse its values.
+DEFAULT_VALUE_INPUT_OPTION = "RAW"
+
+# Worksheets with "date_columns" are sent as USER_ENTERED so those ISO date strings become real
+# Sheets dates (sortable, filterable, usable as chart axes). Every other text cell in them gets this
+# prefix, which makes Sheets keep it as literal text (like RAW) without storing the quote itself.
+TEXT_LITERAL_PREFIX = "'"
+
+# Float values that can't be serialized to JSON; written as empty cells instead
+NON_FINITE_FLOATS = (float("inf"), float("-inf"))
+
 # Define queries and target worksheet names
 QUERY_CONFIGS = [
     {
@@ -37,11 +50,13 @@ QUERY_CONFIGS = [
     },
     {
         "query": "SELECT * FROM vw_RankChanges",
-        "worksheet_name": "RankChanges" # Name of the fourth target worksheet (tab)
+        "worksheet_name": "RankChanges", # Name of the fourth target worksheet (tab)
+        "date_columns": ["date"]
     },
     {
         "query": "SELECT * FROM vw_TimeOnList",
-        "worksheet_name": "TimeOnList" # Name of the fifth target worksheet (tab)
+        "worksheet_name": "TimeOnList", # Name of the fifth target worksheet (tab)
+        "date_columns": ["first_seen_date", "last_seen_date"]
     }
     # Add more dictionaries here for other queries and their target sheets
 ]
@@ -59,7 +74,26 @@ logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
 
 # --- End Configuration ---
 
-def update_multiple_google_sheets(db_path, sheet_id, query_configs, key_file_path):
+def authorize_gspread(key_file_path):
+    """
+    Authenticates with the Google service account key and returns a gspread client.
+
+    Args:
+        key_file_path (str): Path to the Google service account JSON key file.
+    """
+    # Define Google API scopes
+    scopes = [
+        'https://www.googleapis.com/auth/spreadsheets',
+        'https://www.googleapis.com/auth/drive.file'
+    ]
+
+    # Authenticate using service account
+    logging.info("Authenticating using key: %s", key_file_path)
+    credentials = Credentials.from_service_account_file(key_file_path, scopes=scopes)
+    return gspread.authorize(credentials)
+
+
+def update_multiple_google_sheets(db_path, sheet_id, query_configs, key_file_path, conn=None, gc=None):
     """
     Reads data from multiple SQLite queries (views/tables) and updates
     corresponding worksheets in a Google Sheet. Handles NaN/None values.
@@ -67,105 +101,133 @@ def update_multiple_google_sheets(db_path, sheet_id, query_configs, key_file_pat
     Args:
         db_path (str): Path to the SQLite database file.
         sheet_id (str): The ID of the Google Sheet.
-        query_configs (list): A list of dictionaries, each containing 'query' and 'worksheet_name'.
+        query_configs (list): A list of dictionaries, each containing 'query' and 'worksheet_name',
+            plus optionally 'value_input_option' or 'date_columns' (column names Sheets should parse as dates).
         key_file_path (str): Path to the Google service account JSON key file.
+        conn (sqlite3.Connection, optional): An open connection to reuse instead of opening db_path.
+            It is left open for the caller.
+        gc (gspread.Client, optional): An authorized client to reuse instead of authenticating with key_file_path.
     """
-    conn = None
-    gc = None
+    owns_conn = conn is None
 
     try:
         logging.info("Script started.")
-        # Define Google API scopes
-        scopes = [
-            'https://www.googleapis.com/auth/spreadsheets',
-            'https://www.googleapis.com/auth/drive.file'
-        ]
-
-        # Authenticate using service account
-        logging.info(f"Authenticating using key: {key_file_path}")
-        credentials = Credentials.from_service_account_file(key_file_path, scopes=scopes)
-        gc = gspread.authorize(credentials)
+        if gc is None:
+            gc = authorize_gspread(key_file_path)
 
         # Open the main Google Sheet by ID
-        logging.info(f"Opening Google Sheet ID: '{sheet_id}'")
+        logging.info("Opening Google Sheet ID: '%s'", sheet_id)
         spreadsheet = gc.open_by_key(sheet_id)
 
-        # Connect to SQLite database
-        logging.info(f"Connecting to database: {db_path}")
-        conn = sqlite3.connect(db_path)
+        if owns_conn:
+            # Connect to SQLite database
+            logging.info("Connecting to database: %s", db_path)
+            # WAL mode (via db.connect) so reading the views doesn't block a scraper that is writing
+            conn = connect(db_path)
+        # Read-heavy session: 64 MB page cache and memory-map the file for the view queries
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA mmap_size=268435456")
+
+        # Refresh planner statistics so the view queries use the Top100Lists indexes
+        try:
+            conn.execute("ANALYZE Top100Lists")
+        except sqlite3.Error as e:
+            logging.warning("Could not ANALYZE Top100Lists (queries will still run): %s", e)
+
+        # Fetch the worksheet list once instead of one lookup request per worksheet
+        existing_worksheets = {ws.title for ws in spreadsheet.worksheets()}
+
+        # Ranges to clear and data to write, sent to the Sheets API in one batch each after the loop
+        batch_clear = []
+        batch_data = {} # value input option -> list of {"range", "values"} entries
 
         # Loop through each query configuration
         for config in query_configs:
             query = config["query"]
             worksheet_name = config["worksheet_name"]
-            logging.info(f"--- Processing Worksheet: '{worksheet_name}' ---")
+            logging.info("--- Processing Worksheet: '%s' ---", worksheet_name)
 
             try:
-                # Read data from SQLite using pandas
-                logging.info(f"Executing SQL query: {query[:100]}...")
-                df = pd.read_sql_query(query, conn)
-                logging.info(f"Successfully read {len(df)} rows from the database for '{worksheet_name}'.")
-
-                # --- *** Data Cleaning Step (using Pandas) *** ---
-                # Replace NaN and None with empty strings for JSON compatibility
-                # fillna('') handles both None and NaN for object columns
-                # Convert potential problematic floats AFTER reading from SQL
-                for col in df.select_dtypes(include=['float']).columns:
-                     # Check if the column actually contains NaNs before converting
-                     if df[col].isnull().any():
-                          df[col] = df[col].apply(lambda x: '' if pd.isna(x) else x)
-
-                # Replace any remaining None values (often read as None from DB)
-                df = df.fillna('') # Replace Python None/np.nan with empty string
-
-                logging.debug(f"Data cleaned for worksheet '{worksheet_name}'.")
-                # --- *** End of Data Cleaning Step *** ---
-
-                # Prepare data including headers from the DataFrame
-                # Convert DataFrame back to list of lists for gspread
-                data_to_write = [df.columns.values.tolist()] + df.values.tolist()
-
-                # Select the target worksheet
-                try:
-                    worksheet = spreadsheet.worksheet(worksheet_name)
-                    logging.info(f"Found existing worksheet: '{worksheet_name}'.")
-                except gspread.exceptions.WorksheetNotFound:
-                    logging.warning(f"Worksheet '{worksheet_name}' not found. Skipping update for this sheet.")
+                # Skip the query entirely if there is nowhere to write its results
+                if worksheet_name not in existing_worksheets:
+                    logging.warning("Worksheet '%s' not found. Skipping update for this sheet.", worksheet_name)
                     continue
 
-                # Clear existing data in the worksheet
-                logging.info(f"Clearing existing data from worksheet '{worksheet_name}'.")
-                worksheet.clear()
-
-                # Write the data to the worksheet starting at START_CELL
-                logging.info(f"Writing {len(data_to_write)} rows (incl. header) to '{worksheet_name}' starting at {START_CELL}.")
-                worksheet.update(range_name=START_CELL, values=data_to_write, value_input_option='USER_ENTERED')
+                # Read rows straight from a cursor; gspread only needs plain lists, not a DataFrame
+                logging.info("Executing SQL query: %s...", query[:100])
+                cursor = conn.execute(query)
+                headers = [col[0] for col in cursor.description]
+                rows = cursor.fetchall()
+                logging.info("Successfully read %s rows from the database for '%s'.", len(rows), worksheet_name)
+
+                # --- *** Data Cleaning Step *** ---
+                # SQLite returns NaN as NULL, so None and +/-inf are the only values that aren't valid JSON
+                data_to_write = [headers] + [
+                    ['' if value is None or value in NON_FINITE_FLOATS else value for value in row]
+                    for row in rows
+                ]
+
+                # Dates go up as USER_ENTERED so Sheets parses them; quote all other text so it isn't parsed
+                date_columns = config.get("date_columns", [])
+                missing_date_columns = [name for name in date_columns if name not in headers]
+                if missing_date_columns:
+                    logging.warning("Date column(s) %s not returned for '%s'.", missing_date_columns, worksheet_name)
+                if date_columns:
+                    literal_indexes = [i for i, name in enumerate(headers) if name not in date_columns]
+                    for row in data_to_write[1:]:
+                        for i in literal_indexes:
+                            if isinstance(row[i], str) and row[i]:
+                                row[i] = TEXT_LITERAL_PREFIX + row[i]
+                # --- *** End of Data Cleaning Step *** ---
 
-                logging.info(f"Successfully updated worksheet '{worksheet_name}'.")
+                # A bare sheet name as the range clears every cell, same as worksheet.clear()
+                batch_clear.append(f"'{worksheet_name}'")
+                if date_columns:
+                    value_input_option = "USER_ENTERED"
+                else:
+                    value_input_option = config.get("value_input_option", DEFAULT_VALUE_INPUT_OPTION)
+                batch_data.setdefault(value_input_option, []).append(
+                    {"range": f"'{worksheet_name}'!{START_CELL}", "values": data_to_write}
+                )
+                logging.info("Queued %s rows (incl. header) for '%s' starting at %s.", len(data_to_write), worksheet_name, START_CELL)
 
             except sqlite3.Error as e:
-                logging.error(f"SQLite query error for worksheet '{worksheet_name}': {e}", exc_info=True)
+                logging.error("SQLite query error for worksheet '%s': %s", worksheet_name, e, exc_info=True)
+            except Exception as e:
+                logging.error("Unexpected error processing worksheet '%s': %s", worksheet_name, e, exc_info=True)
+
+        # --- Upload all worksheets in two requests (clear + write) ---
+        if batch_data:
+            try:
+                logging.info("Clearing existing data from %s worksheet(s).", len(batch_clear))
+                spreadsheet.values_batch_clear(body={"ranges": batch_clear})
+
+                # valueInputOption applies to a whole request, so send one batch per option in use
+                for value_input_option, data in batch_data.items():
+                    logging.info("Writing %s worksheet(s) in one batch update (%s).", len(data), value_input_option)
+                    spreadsheet.values_batch_update(body={"valueInputOption": value_input_option, "data": data})
+                    logging.info("Successfully updated worksheets: %s", ', '.join(r['range'] for r in data))
             except gspread.exceptions.APIError as e:
-                 logging.error(f"Google Sheets API error for worksheet '{worksheet_name}': {e}", exc_info=True)
+                 logging.error("Google Sheets API error during batch update: %s", e, exc_info=True)
             # Catch the specific JSON error from requests if it bubbles up
             except requests.exceptions.InvalidJSONError as e_json:
-                 logging.error(f"JSON Encoding error sending data for worksheet '{worksheet_name}'. Check NaN/Inf values: {e_json}", exc_info=True)
-            except Exception as e:
-                logging.error(f"Unexpected error processing worksheet '{worksheet_name}': {e}", exc_info=True)
+                 logging.error("JSON Encoding error sending batch data. Check NaN/Inf values: %s", e_json, exc_info=True)
+        else:
+            logging.warning("No worksheet data prepared. Nothing uploaded.")
 
     except FileNotFoundError as e:
-        logging.error(f"Setup error - File not found: {e}")
+        logging.error("Setup error - File not found: %s", e)
     except gspread.exceptions.SpreadsheetNotFound:
-         logging.error(f"Setup error - Google Sheet ID '{sheet_id}' not found or not shared correctly.")
+         logging.error("Setup error - Google Sheet ID '%s' not found or not shared correctly.", sheet_id)
     except gspread.exceptions.APIError as e_gspread_conn:
-         logging.error(f"Setup error - Failed to connect to Google Sheets (check credentials/API access/scopes): {e_gspread_conn}")
+         logging.error("Setup error - Failed to connect to Google Sheets (check credentials/API access/scopes): %s", e_gspread_conn)
     except sqlite3.Error as e:
-        logging.error(f"Failed to connect to database {db_path}: {e}")
+        logging.error("Failed to connect to database %s: %s", db_path, e)
     except Exception as e:
-        logging.error(f"A critical setup or connection error occurred: {e}", exc_info=True)
+        logging.error("A critical setup or connection error occurred: %s", e, exc_info=True)
     finally:
-        # Close the database connection
-        if conn:
+        # Close the database connection (only if it was opened here)
+        if owns_conn and conn:
             conn.close()
             logging.info("Database connection closed.")
         logging.info("Script finished.")
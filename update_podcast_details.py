@@ -1,12 +1,19 @@
 import os
 import sqlite3
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
+import threading
 import hashlib
-import difflib
+import functools
+from rapidfuzz import fuzz, process
 import json
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from db import bootstrap_db, connect
 from typing import List, Dict, Optional, Any # Optional, for potential future use
 
 # --- Configuration ---
@@ -21,6 +28,25 @@ LOG_LEVEL = logging.INFO # Configure logging level
 # *** Search Matching Configuration ***
 SEARCH_ACCEPTANCE_THRESHOLD = 0.90 # Minimum ratio for fuzzy match acceptance (e.g., 0.90 = 90%)
 
+# *** API Concurrency Configuration ***
+MAX_FETCH_WORKERS = 8 # Titles looked up in parallel (each lookup is 2-4 sequential API calls)
+API_MAX_REQUESTS_PER_SECOND = 4 # Replaces the old fixed sleeps between titles
+DB_WRITE_BATCH_SIZE = 100 # Podcasts buffered per write transaction
+LOOKUP_CACHE_SIZE = 4096 # Per-run memo entries for searches, feed details and episode info
+
+# *** SQL Statements (batch writes) ***
+# Module constants so every batch passes the same SQL text and hits the connection's prepared-statement cache
+SQL_UPSERT_PODCAST = '''
+    INSERT OR REPLACE INTO Podcasts
+    (podcast_id, title, description, feed_url, image_url, episode_count, avg_duration_last_10, latest_episode_title, last_update_time, podcast_guid, original_url)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_DELETE_PC = "DELETE FROM PodcastCategories WHERE podcast_id = ?"
+SQL_INSERT_CAT = "INSERT OR IGNORE INTO Categories (category_id, category_name) VALUES (?, ?)"
+SQL_INSERT_PC = "INSERT OR IGNORE INTO PodcastCategories (podcast_id, category_id) VALUES (?, ?)"
+SQL_UPSERT_FEED_CACHE = "INSERT OR REPLACE INTO FeedDetailsCache (feed_id, last_update_time, payload) VALUES (?, ?, ?)"
+SQLITE_CACHED_STATEMENTS = 256 # sqlite3.connect's default is 128
+
 # --- Setup Logging ---
 # Explicitly set the stream to standard output
 logging.basicConfig(
@@ -47,6 +73,17 @@ except ImportError:
     logging.info(".env file not used (dotenv library not found). Reading variables directly from environment.")
     pass # dotenv not installed, proceed assuming variables are set in the OS environment
 
+# --- JSON Decoding (orjson if available) ---
+try:
+    import orjson
+    decode_json = orjson.loads # orjson.JSONDecodeError subclasses json.JSONDecodeError, so the handlers below still catch it
+    encode_json = orjson.dumps
+except ImportError:
+    logging.info("orjson not found. Decoding API responses with the standard json module.")
+    decode_json = json.loads # Also accepts the raw response bytes
+    def encode_json(obj):
+        return json.dumps(obj).encode("utf-8") # bytes, like orjson.dumps
+
 API_KEY = os.environ.get("PODCASTINDEX_API_KEY")
 API_SECRET = os.environ.get("PODCASTINDEX_API_SECRET")
 
@@ -54,71 +91,205 @@ if not API_KEY or not API_SECRET:
     logging.error("Error: Podcast Index API keys not found in environment variables (PODCASTINDEX_API_KEY, PODCASTINDEX_API_SECRET).")
     exit(1) # Exit if keys are missing
 
+# Key + secret prefix of every auth signature, encoded once instead of per get_headers() call
+_KEY_SECRET = (API_KEY + API_SECRET).encode("utf-8")
+
 BASE_URL = "https://api.podcastindex.org/api/1.0/"
 
+# Shared HTTP session: the fetch workers reuse kept-alive TLS connections instead of opening one per call,
+# and transient errors (including 429 rate limiting, honouring Retry-After) are retried with backoff
+SESSION = requests.Session()
+SESSION.headers.update({"Accept-Encoding": "gzip, deflate"})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
 # --- Helper Functions ---
 
+# (second, headers) of the last get_headers() call; the signature only changes once per second
+_headers_cache = (None, None)
+
 def get_headers():
-    """Generates the required authentication headers for the API."""
-    auth_date = str(int(time.time()))
-    auth_string = API_KEY + API_SECRET + auth_date
-    authorization = hashlib.sha1(auth_string.encode("utf-8")).hexdigest()
+    """
+    Generates the required authentication headers for the API.
+    X-Auth-Date has one-second resolution, so headers built earlier in the same second are reused
+    rather than re-hashed. Callers must not modify the returned dict.
+    """
+    global _headers_cache
+    auth_date = int(time.time())
+    cached_date, cached_headers = _headers_cache # One tuple read, so worker threads always see a matching pair
+    if cached_date == auth_date:
+        return cached_headers
+
+    auth_hash = hashlib.sha1(_KEY_SECRET)
+    auth_hash.update(str(auth_date).encode("ascii"))
+    authorization = auth_hash.hexdigest()
     headers = {
         "User-Agent": "PodcastDashboard/Local/1.5-Cats", # Updated UA Version
         "X-Auth-Key": API_KEY,
-        "X-Auth-Date": auth_date,
+        "X-Auth-Date": str(auth_date),
         "Authorization": authorization,
     }
+    _headers_cache = (auth_date, headers)
     return headers
 
+class RateLimiter:
+    """
+    Token bucket shared by all fetch workers: up to rate_per_sec requests may go out in a burst,
+    after which tokens refill at rate_per_sec per second.
+    """
+
+    def __init__(self, rate_per_sec):
+        self.rate_per_sec = rate_per_sec
+        self.tokens = float(rate_per_sec)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate_per_sec, self.tokens + (now - self.last_refill) * self.rate_per_sec)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_seconds = (1 - self.tokens) / self.rate_per_sec
+            time.sleep(wait_seconds) # Sleep outside the lock so other workers can check in meanwhile
+
+# Acquired before get_headers() in every API helper, so X-Auth-Date isn't stale by the time the request goes out
+API_RATE_LIMITER = RateLimiter(API_MAX_REQUESTS_PER_SECOND)
+
+@dataclass(slots=True)
+class FeedDetails:
+    """The stored fields of a Podcast Index 'feed' object, read out of the response dict once."""
+    id: Optional[int]
+    title: Optional[str]
+    description: Optional[str]
+    url: Optional[str]
+    original_url: Optional[str]
+    image_url: Optional[str]
+    episode_count: Optional[int]
+    last_update_time: Optional[int]
+    categories: Optional[Dict[str, str]]
+    podcast_guid: Optional[str]
+
+    @classmethod
+    def from_feed(cls, feed: Dict[str, Any]) -> "FeedDetails":
+        """Builds a FeedDetails from a 'feed' dict (podcasts/byfeedid or byfeedurl)."""
+        return cls(
+            id=feed.get("id"),
+            title=feed.get("title"),
+            description=feed.get("description"),
+            url=feed.get("url"),
+            original_url=feed.get("originalUrl"),
+            image_url=feed.get("image") or feed.get("artwork"),
+            episode_count=feed.get("episodeCount"),
+            last_update_time=feed.get("lastUpdateTime"),
+            categories=feed.get("categories"),
+            podcast_guid=feed.get("podcastGuid"),
+        )
+
+class _UncachedResult(Exception):
+    """Carries a failed lookup's result out of lru_cache, which doesn't store calls that raise."""
+
+    def __init__(self, result):
+        super().__init__()
+        self.result = result
+
+def cache_successful_results(is_failure):
+    """
+    Memoizes a lookup like functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE), except that results for
+    which is_failure(result) is true (timeouts, exhausted retries, ...) aren't stored, so the next
+    title that resolves to the same feed tries the API again.
+    """
+    def decorator(func):
+        @functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)
+        def cached(*args):
+            result = func(*args)
+            if is_failure(result):
+                raise _UncachedResult(result)
+            return result
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            try:
+                return cached(*args)
+            except _UncachedResult as e:
+                return e.result
+        return wrapper
+    return decorator
+
 # --- Search Functions (With Stricter Matching) ---
-# (Search functions remain unchanged from the previous version - included for completeness)
+def normalize_title(title):
+    """Case-insensitive, trimmed form of a title used for all match comparisons."""
+    return title.strip().lower()
+
+def select_best_match(query, candidates, title_keys):
+    """
+    Picks the search result whose title best matches the query.
+
+    rapidfuzz scores the candidates in one call and the best one is returned only if it reaches
+    SEARCH_ACCEPTANCE_THRESHOLD. An exact (case-insensitive, trimmed) title match is the only way to
+    score 100, which extractOne treats as optimal and stops scanning at, so it still wins immediately.
+
+    Args:
+        query: The chart title being searched for.
+        candidates: Result dicts from a Podcast Index search endpoint.
+        title_keys: Keys to read the candidate title from, in order of preference.
+
+    Returns:
+        The matching candidate dict, or None if nothing is close enough.
+    """
+    query_lower_stripped = normalize_title(query)
+    candidate_titles = [next((res.get(key) for key in title_keys if res.get(key)), "") for res in candidates]
+    normalized_titles = [normalize_title(candidate_title) for candidate_title in candidate_titles] # Normalized once, reused below
+
+    # *** Length prefilter: ratio = 2*matches/(lq+lc) and matches <= min(lq, lc), so a candidate
+    # whose length alone caps the ratio below the threshold is skipped without being scored ***
+    lq = len(query_lower_stripped)
+    plausible_titles = {
+        i: normalized_title for i, normalized_title in enumerate(normalized_titles)
+        if normalized_title and 2 * min(lq, len(normalized_title)) >= SEARCH_ACCEPTANCE_THRESHOLD * (lq + len(normalized_title))
+    }
+
+    # *** Take the best fuzzy ratio, if it clears the threshold (rapidfuzz scores are 0-100) ***
+    best = process.extractOne(
+        query_lower_stripped, plausible_titles,
+        scorer=fuzz.ratio, processor=None, # Choices are already normalized
+        score_cutoff=SEARCH_ACCEPTANCE_THRESHOLD * 100
+    )
+    if best is None:
+        logging.info(f"No *good* match found for '{query}' (no candidate reached threshold {SEARCH_ACCEPTANCE_THRESHOLD})")
+        return None
+
+    _, best_score, best_index = best
+    if best_score == 100:
+        logging.info(f"Exact match found for '{query}': '{candidate_titles[best_index]}'")
+    else:
+        logging.info(f"Best ratio for '{query}': {best_score / 100:.2f} (Match: '{candidate_titles[best_index]}')")
+    return candidates[best_index]
+
 def search_byterm(query):
     """Search using 'search/byterm', prioritize exact match, then check fuzzy ratio threshold."""
     endpoint = "search/byterm"
     url = BASE_URL + endpoint
     params = {"q": query, "max": 10}
+    API_RATE_LIMITER.acquire()
     headers = get_headers()
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        response = SESSION.get(url, headers=headers, params=params, timeout=10)
         logging.debug(f"Raw response for '{query}': {response.text[:200]}...")
         response.raise_for_status()
-        data = response.json()
+        data = decode_json(response.content)
         results = data.get("feeds") or data.get("results", [])
         if results:
-            best_match = None
-            best_ratio = 0
-            query_lower_stripped = query.strip().lower() # Prepare query for comparison
-
-            for res in results:
-                candidate_title = res.get("title_original", "") or res.get("title", "")
-                if not candidate_title: continue
-
-                candidate_lower_stripped = candidate_title.strip().lower()
-
-                # *** Check for Exact Match (Case-Insensitive, Trimmed) ***
-                if query_lower_stripped == candidate_lower_stripped:
-                    logging.info(f"Exact match found for '{query}': '{candidate_title}'")
-                    best_match = res
-                    best_ratio = 1.0 # Assign perfect ratio
-                    break # Found exact match, no need to check further ratios
-
-                # *** If no exact match yet, calculate ratio ***
-                ratio = difflib.SequenceMatcher(None, query_lower_stripped, candidate_lower_stripped).ratio()
-                logging.debug(f"  Comparing '{query}' vs '{candidate_title}' -> Ratio: {ratio:.2f}")
-                if ratio > best_ratio:
-                    best_ratio = ratio
-                    best_match = res
-
-            # *** Check final result against threshold ***
-            logging.info(f"Best ratio for '{query}': {best_ratio:.2f} (Match: '{best_match.get('title') if best_match else 'None'}')")
-            if best_match and best_ratio >= SEARCH_ACCEPTANCE_THRESHOLD:
+            best_match = select_best_match(query, results, ("title_original", "title"))
+            if best_match:
                 return best_match
-            else:
-                if best_match: # Found a match but ratio too low
-                    logging.info(f"No *good* match found for '{query}' (Best ratio {best_ratio:.2f} below threshold {SEARCH_ACCEPTANCE_THRESHOLD})")
-                else: # No results found at all in the API response
-                     logging.info(f"No results found for '{query}' in search response.")
         else:
             logging.info(f"No results found for '{query}' in search response.")
 
@@ -137,47 +308,19 @@ def search_bytitle(query):
     endpoint = "search/bytitle"
     url = BASE_URL + endpoint
     params = {"q": query, "max": 10}
+    API_RATE_LIMITER.acquire()
     headers = get_headers()
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        response = SESSION.get(url, headers=headers, params=params, timeout=10)
         logging.debug(f"Raw response for '{query}': {response.text[:200]}...")
         response.raise_for_status()
-        data = response.json()
+        data = decode_json(response.content)
         feeds = data.get("feeds", []) # Note: search/bytitle primarily uses 'feeds' key
         if feeds:
-            best_match = None
-            best_ratio = 0
-            query_lower_stripped = query.strip().lower()
-
-            for feed in feeds:
-                candidate_title = feed.get("title", "") # search/bytitle generally just has "title"
-                if not candidate_title: continue
-
-                candidate_lower_stripped = candidate_title.strip().lower()
-
-                # *** Check for Exact Match (Case-Insensitive, Trimmed) ***
-                if query_lower_stripped == candidate_lower_stripped:
-                    logging.info(f"Exact match found for '{query}': '{candidate_title}'")
-                    best_match = feed
-                    best_ratio = 1.0
-                    break
-
-                # *** If no exact match yet, calculate ratio ***
-                ratio = difflib.SequenceMatcher(None, query_lower_stripped, candidate_lower_stripped).ratio()
-                logging.debug(f"  Comparing '{query}' vs '{candidate_title}' -> Ratio: {ratio:.2f}")
-                if ratio > best_ratio:
-                    best_ratio = ratio
-                    best_match = feed
-
-            # *** Check final result against threshold ***
-            logging.info(f"Best ratio for '{query}': {best_ratio:.2f} (Match: '{best_match.get('title') if best_match else 'None'}')")
-            if best_match and best_ratio >= SEARCH_ACCEPTANCE_THRESHOLD:
+            # search/bytitle generally just has "title"
+            best_match = select_best_match(query, feeds, ("title",))
+            if best_match:
                 return best_match
-            else:
-                if best_match:
-                    logging.info(f"No *good* match found for '{query}' (Best ratio {best_ratio:.2f} below threshold {SEARCH_ACCEPTANCE_THRESHOLD})")
-                else:
-                     logging.info(f"No results found for '{query}' in search response.")
         else:
             logging.info(f"No results found for '{query}' in search response.")
 
@@ -192,7 +335,16 @@ def search_bytitle(query):
     return None
 
 def search_podcast_combined(query):
-    """Try searching using byterm first; if that fails or match is poor, fall back to bytitle."""
+    """
+    Try searching using byterm first; if that fails or match is poor, fall back to bytitle.
+    Results are memoized by normalized title, so titles differing only in case or surrounding
+    whitespace (e.g. 'The Daily' and 'the daily ') are searched once per run.
+    """
+    return _search_podcast_combined_cached(normalize_title(query))
+
+@functools.lru_cache(maxsize=LOOKUP_CACHE_SIZE)
+def _search_podcast_combined_cached(query):
+    """search_podcast_combined for an already-normalized title."""
     logging.info(f"\n--- Searching combined for: '{query}' ---")
     result = search_byterm(query)
     if not result:
@@ -206,20 +358,22 @@ def search_podcast_combined(query):
         logging.warning(f"--> Combined search FAILED for: '{query}' (No suitable match found via byterm or bytitle)")
         return None
 
-# --- Detail Fetching Functions --- (Unchanged from previous local version)
+# --- Detail Fetching Functions --- (Successful results memoized per feed ID: several titles can resolve to the same feed)
 
+@cache_successful_results(lambda details: details is None)
 def get_full_podcast_details_by_feed_id(feed_id):
     """Retrieve full podcast details using 'podcasts/byfeedid'."""
     endpoint = "podcasts/byfeedid"
     url = BASE_URL + endpoint
     params = {"id": feed_id, "pretty": 1}
+    API_RATE_LIMITER.acquire()
     headers = get_headers()
     logging.info(f"--- Fetching details by Feed ID: {feed_id} ---")
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=15)
+        response = SESSION.get(url, headers=headers, params=params, timeout=15)
         logging.debug(f"Raw response for ID {feed_id}: {response.text[:200]}...")
         response.raise_for_status()
-        data = response.json()
+        data = decode_json(response.content)
         if data.get("feed"):
             logging.debug(f"Successfully fetched details for Feed ID: {feed_id}")
             return data["feed"]
@@ -243,13 +397,14 @@ def get_full_podcast_details_by_feed_url(feed_url):
     endpoint = "podcasts/byfeedurl"
     url = BASE_URL + endpoint
     params = {"url": feed_url, "pretty": 1}
+    API_RATE_LIMITER.acquire()
     headers = get_headers()
     logging.info(f"--- Fetching details by Feed URL: {feed_url[:50]}... ---")
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=15)
+        response = SESSION.get(url, headers=headers, params=params, timeout=15)
         logging.debug(f"Raw response for URL {feed_url[:50]}...: {response.text[:200]}...")
         response.raise_for_status()
-        data = response.json()
+        data = decode_json(response.content)
         if data.get("feed"):
             logging.debug(f"Successfully fetched details for Feed URL: {feed_url[:50]}...")
             return data["feed"]
@@ -268,6 +423,7 @@ def get_full_podcast_details_by_feed_url(feed_url):
         logging.error(f"General Exception for URL {feed_url[:50]}...: {e}", exc_info=True)
     return None
 
+@cache_successful_results(lambda info: info == (None, None))
 def get_latest_episode_info(feed_id):
     """
     Fetches the latest 10 episodes for a feed ID.
@@ -277,6 +433,7 @@ def get_latest_episode_info(feed_id):
     endpoint = "episodes/byfeedid"
     url = BASE_URL + endpoint
     params = {"id": feed_id, "max": 10, "pretty": 1}
+    API_RATE_LIMITER.acquire()
     headers = get_headers()
 
     logging.info(f"--- Fetching latest episode info for Feed ID: {feed_id} ---")
@@ -285,10 +442,10 @@ def get_latest_episode_info(feed_id):
     average_duration = None
 
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        response = SESSION.get(url, headers=headers, params=params, timeout=10)
         logging.debug(f"Raw response for {feed_id}: {response.text[:150]}...")
         response.raise_for_status()
-        data = response.json()
+        data = decode_json(response.content)
         items = data.get("items", [])
 
         if not items:
@@ -298,17 +455,12 @@ def get_latest_episode_info(feed_id):
         latest_episode_title = items[0].get("title")
         logging.debug(f"Latest episode title: '{latest_episode_title}'")
 
-        total_duration = 0
-        valid_episode_count = 0
-        for episode in items:
-            duration = episode.get("duration")
-            if duration and isinstance(duration, int) and duration > 0:
-                total_duration += duration
-                valid_episode_count += 1
-
-        if valid_episode_count > 0:
-            average_duration = int(total_duration / valid_episode_count)
-            logging.debug(f"Avg duration (last {valid_episode_count}) for {feed_id}: {average_duration} sec")
+        # Single pass over the episodes, keeping only positive integer durations
+        durations = [d for d in (episode.get("duration") for episode in items) if isinstance(d, int) and d > 0]
+
+        if durations:
+            average_duration = sum(durations) // len(durations)
+            logging.debug(f"Avg duration (last {len(durations)}) for {feed_id}: {average_duration} sec")
         else:
             logging.info(f"No valid durations found in the last {len(items)} episodes for {feed_id}")
 
@@ -327,6 +479,92 @@ def get_latest_episode_info(feed_id):
 
     return None, None
 
+def fetch_candidate_and_details(title, feed_details_cache):
+    """
+    Runs all API lookups for one chart title (search, full details, latest episodes).
+    Called from the worker threads, so it must not touch the database.
+
+    Full details come from feed_details_cache instead of the API when the cached copy is at least as
+    new as the search candidate's lastUpdateTime (the feed hasn't changed since it was cached).
+
+    Args:
+        title: The chart title to look up.
+        feed_details_cache: {feed_id: (last_update_time, payload)} loaded from FeedDetailsCache; read-only here.
+
+    Returns:
+        A (candidate, full_details, avg_duration_last_10, latest_episode_title, details_fetched) tuple,
+        or None if no search candidate was found. full_details is None if the details fetch failed;
+        details_fetched is True when full_details came from the API (and should be cached).
+    """
+    # ... (Search logic) ...
+    candidate = search_podcast_combined(title)
+    if not candidate:
+        return None
+
+    # ... (Get Full Details logic) ...
+    candidate_feed_id = candidate.get("id")
+    full_details = None
+    cached_update_time, cached_payload = feed_details_cache.get(candidate_feed_id, (None, None))
+    candidate_update_time = candidate.get("lastUpdateTime")
+    if cached_payload and cached_update_time is not None and candidate_update_time is not None and cached_update_time >= candidate_update_time:
+        logging.info(f"--- Using cached details for Feed ID: {candidate_feed_id} (unchanged since {cached_update_time}) ---")
+        full_details = decode_json(cached_payload)
+        avg_dur_10, latest_title = get_latest_episode_info(candidate_feed_id)
+        return candidate, full_details, avg_dur_10, latest_title, False
+
+    if candidate_feed_id:
+        full_details = get_full_podcast_details_by_feed_id(candidate_feed_id)
+    else:
+         logging.warning(f"Candidate for '{title}' found, but missing 'id'. Candidate data: {candidate}")
+
+    if not full_details:
+         feed_url_from_candidate = candidate.get("url") or candidate.get("originalUrl")
+         if feed_url_from_candidate:
+             logging.info(f"-> Feed ID fetch failed or missing, falling back to Feed URL for '{title}'")
+             full_details = get_full_podcast_details_by_feed_url(feed_url_from_candidate)
+         else:
+             logging.warning(f"Cannot fall back to feed URL for '{title}', URL missing in candidate: {candidate}")
+
+    # ... (Latest episodes, only needed when the details will be stored) ...
+    avg_dur_10, latest_title = None, None
+    if full_details and full_details.get("id"):
+        avg_dur_10, latest_title = get_latest_episode_info(full_details["id"])
+
+    return candidate, full_details, avg_dur_10, latest_title, full_details is not None
+
+def write_podcast_batch(conn, podcast_rows, category_rows, pc_link_rows, cache_rows):
+    """
+    Writes a batch of buffered podcast rows in one transaction; on error the whole batch is rolled back.
+
+    Statements run in the same order the per-podcast writes used: replace the podcasts, clear their
+    old category links, then add the categories and the new links.
+
+    Args:
+        conn: Open connection with the details tables created.
+        podcast_rows: Podcasts tuples in column order (podcast_id first).
+        category_rows: (category_id, category_name) tuples.
+        pc_link_rows: (podcast_id, category_id) tuples.
+        cache_rows: (feed_id, last_update_time, payload) tuples for details freshly fetched from the API.
+
+    Returns:
+        The number of podcasts that could not be written (0 on success, len(podcast_rows) on error).
+    """
+    if not podcast_rows:
+        return 0
+    try:
+        with conn: # Commits once for the whole batch, or rolls it back
+            conn.executemany(SQL_UPSERT_PODCAST, podcast_rows)
+            conn.executemany(SQL_DELETE_PC, [(row[0],) for row in podcast_rows])
+            conn.executemany(SQL_INSERT_CAT, category_rows)
+            conn.executemany(SQL_INSERT_PC, pc_link_rows)
+            conn.executemany(SQL_UPSERT_FEED_CACHE, cache_rows)
+    except sqlite3.Error as e:
+        logging.error(f"!!! DATABASE ERROR writing batch of {len(podcast_rows)} podcasts (Feed IDs {podcast_rows[0][0]}..{podcast_rows[-1][0]}): {e} !!!")
+        return len(podcast_rows)
+
+    logging.info(f"### SUCCESS: Wrote {len(podcast_rows)} podcasts and {len(pc_link_rows)} category links to DB ###")
+    return 0
+
 
 # (Keep imports and config/setup above)
 
@@ -345,29 +583,13 @@ def update_all_podcast_details(db_path: str):
 
     try:
         # --- Phase 1: Connect and Schema Setup ---
-        conn = sqlite3.connect(db_path)
+        bootstrap_db(db_path) # Shared tables (Top100Lists) live in db.py
+        conn = connect(db_path, cached_statements=SQLITE_CACHED_STATEMENTS) # WAL + synchronous=NORMAL, shared with the scrapers
         conn.execute("PRAGMA foreign_keys = ON;")
         cursor = conn.cursor()
         logging.info(f"Connected to database: {db_path}")
 
-        # Drop dependent table first if it exists
-        cursor.execute("DROP TABLE IF EXISTS PodcastCategories;")
-        # Drop main table
-        cursor.execute("DROP TABLE IF EXISTS Podcasts;")
-        logging.info("Dropped existing Podcasts and PodcastCategories tables (if they existed).")
-
-        # Ensure ALL tables exist with the correct schema
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Top100Lists (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                platform TEXT NOT NULL,
-                rank INTEGER NOT NULL,
-                title TEXT,
-                platform_podcast_id TEXT,
-                date TEXT NOT NULL,
-                UNIQUE(platform, rank, date)
-            )
-        ''')
+        # Ensure the details tables exist with the correct schema (Top100Lists is created by bootstrap_db)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS Podcasts (
                 podcast_id INTEGER PRIMARY KEY, title TEXT, description TEXT, feed_url TEXT, image_url TEXT,
@@ -390,9 +612,22 @@ def update_all_podcast_details(db_path: str):
                 FOREIGN KEY (category_id) REFERENCES Categories(category_id) ON DELETE CASCADE
             )
         ''')
-        conn.commit() # Commit schema changes
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS FeedDetailsCache (
+                feed_id INTEGER PRIMARY KEY,
+                last_update_time INTEGER,
+                payload BLOB
+            )
+        ''') # Not cleared daily: lets later runs skip the details fetch for feeds that haven't changed
         logging.info("Ensured all required tables exist with current schema.")
 
+        # Clear yesterday's details so they only reflect the current charts. DELETE keeps the tables
+        # (and their pages) in place instead of dropping and recreating them every run.
+        cursor.execute("DELETE FROM PodcastCategories;") # Dependent table first
+        cursor.execute("DELETE FROM Podcasts;")
+        conn.commit() # Both deletes commit together
+        logging.info("Cleared existing Podcasts and PodcastCategories rows.")
+
         # --- Phase 2: Get Titles (Now AFTER schema setup is confirmed) ---
         # This specific operation can fail if Top100Lists doesn't exist or has issues
         try:
@@ -411,112 +646,72 @@ def update_all_podcast_details(db_path: str):
             return # No need to proceed to Phase 3
 
         # --- Phase 3: Process Each Title (Loop inside the main try block) ---
-        processed_count = 0
-        for title in titles:
-            processed_count += 1
-            logging.info(f"\n======= Processing {processed_count}/{len(titles)}: '{title}' =======")
-
-            # ... (3a. Search logic - unchanged) ...
-            candidate = search_podcast_combined(title)
-            if not candidate:
-                time.sleep(1)
-                continue
-
-            # ... (3b. Get Full Details logic - unchanged) ...
-            candidate_feed_id = candidate.get("id")
-            full_details = None
-            if candidate_feed_id:
-                full_details = get_full_podcast_details_by_feed_id(candidate_feed_id)
-            else:
-                 logging.warning(f"Candidate for '{title}' found, but missing 'id'. Candidate data: {candidate}")
-
-            if not full_details:
-                 feed_url_from_candidate = candidate.get("url") or candidate.get("originalUrl")
-                 if feed_url_from_candidate:
-                     logging.info(f"-> Feed ID fetch failed or missing, falling back to Feed URL for '{title}'")
-                     full_details = get_full_podcast_details_by_feed_url(feed_url_from_candidate)
-                 else:
-                     logging.warning(f"Cannot fall back to feed URL for '{title}', URL missing in candidate: {candidate}")
-
-            # ... (3c. Process Details & Insert/Replace into DB - unchanged) ...
-            if full_details:
-                feed_id = full_details.get("id")
-                if not feed_id:
-                    logging.warning(f"!!! SKIPPING DB operations: 'id' field missing in full_details for '{title}'.")
+        # API lookups run in worker threads (rate-limited by API_RATE_LIMITER); executor.map yields
+        # results in title order, so all DB writes below stay on this thread and this connection
+        # Rows are buffered and written DB_WRITE_BATCH_SIZE podcasts per transaction
+        podcast_rows, category_rows, pc_link_rows, cache_rows = [], [], [], []
+
+        # Cached full details by feed ID, loaded once here because the workers can't use this connection
+        cursor.execute("SELECT feed_id, last_update_time, payload FROM FeedDetailsCache")
+        feed_details_cache = {feed_id: (last_update_time, payload) for feed_id, last_update_time, payload in cursor}
+        logging.info(f"Loaded {len(feed_details_cache)} cached feed details.")
+
+        with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+            fetch_results = executor.map(functools.partial(fetch_candidate_and_details, feed_details_cache=feed_details_cache), titles)
+            for processed_count, (title, fetch_result) in enumerate(zip(titles, fetch_results), start=1):
+                logging.info(f"\n======= Processing {processed_count}/{len(titles)}: '{title}' =======")
+                if not fetch_result:
                     continue
-
-                podcast_title = full_details.get("title")
-                # ... (extract other podcast details) ...
-                description = full_details.get("description")
-                feed_url = full_details.get("url")
-                original_url = full_details.get("originalUrl")
-                image_url = full_details.get("image") or full_details.get("artwork")
-                episode_count = full_details.get("episodeCount")
-                last_update_time = full_details.get("lastUpdateTime")
-                categories_dict = full_details.get("categories") # Get the original dict
-                podcast_guid = full_details.get("podcastGuid")
-
-                avg_dur_10, latest_title = get_latest_episode_info(feed_id)
-
-                if not feed_url: feed_url = candidate.get("url")
-                if not original_url: original_url = candidate.get("originalUrl")
-
-                logging.debug(f"+++ Preparing DB insert/replace for Podcast ID: {feed_id} +++")
-
-                try:
-                    # Insert/Replace main podcast data
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO Podcasts
-                        (podcast_id, title, description, feed_url, image_url, episode_count, avg_duration_last_10, latest_episode_title, last_update_time, podcast_guid, original_url)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        feed_id, podcast_title, description, feed_url, image_url, episode_count,
-                        avg_dur_10, latest_title, last_update_time,
-                        podcast_guid, original_url
+                candidate, full_details, avg_dur_10, latest_title, details_fetched = fetch_result
+
+                # ... (Process Details & buffer rows for the next batch write) ...
+                if full_details:
+                    feed = FeedDetails.from_feed(full_details) # Extract podcast details once
+                    feed_id = feed.id
+                    if not feed_id:
+                        logging.warning(f"!!! SKIPPING DB operations: 'id' field missing in full_details for '{title}'.")
+                        continue
+
+                    categories_dict = feed.categories # Get the original dict
+                    feed_url = feed.url or candidate.get("url")
+                    original_url = feed.original_url or candidate.get("originalUrl")
+
+                    logging.debug(f"+++ Buffering DB insert/replace for Podcast ID: {feed_id} +++")
+                    podcast_rows.append((
+                        feed_id, feed.title, feed.description, feed_url, feed.image_url, feed.episode_count,
+                        avg_dur_10, latest_title, feed.last_update_time,
+                        feed.podcast_guid, original_url
                     ))
-                    logging.debug(f"Podcast info inserted/replaced for ID: {feed_id}")
+
+                    if details_fetched:
+                        cache_rows.append((feed_id, feed.last_update_time, encode_json(full_details)))
 
                     # Process Categories
-                    del_success = True
-                    try:
-                        cursor.execute("DELETE FROM PodcastCategories WHERE podcast_id = ?", (feed_id,))
-                        logging.debug(f"Deleted existing category links for podcast {feed_id} ({cursor.rowcount} rows)")
-                    except sqlite3.Error as e_del:
-                        category_link_errors += 1
-                        del_success = False
-                        logging.error(f"Error deleting old categories for podcast {feed_id}: {e_del}")
-
-                    if del_success and categories_dict and isinstance(categories_dict, dict):
+                    if categories_dict and isinstance(categories_dict, dict):
                         logging.debug(f"Processing {len(categories_dict)} categories for podcast {feed_id}")
-                        for cat_id_str, cat_name in categories_dict.items():
-                            if not cat_id_str or not cat_name: continue
-                            try:
-                                cat_id = int(cat_id_str)
-                                cursor.execute('INSERT OR IGNORE INTO Categories (category_id, category_name) VALUES (?, ?)', (cat_id, cat_name))
-                                cursor.execute('INSERT OR IGNORE INTO PodcastCategories (podcast_id, category_id) VALUES (?, ?)', (feed_id, cat_id))
-                            except ValueError:
-                                category_link_errors += 1
-                                logging.warning(f"Invalid category ID format '{cat_id_str}' for podcast {feed_id}. Skipping category link.")
-                            except sqlite3.Error as e_cat:
-                                category_link_errors += 1
-                                logging.error(f"Error processing category ID {cat_id_str}/{cat_name} for podcast {feed_id}: {e_cat}")
-                    elif del_success:
+                        # isdecimal() strings always parse with int() (isdigit() would also pass '²'), so there's no ValueError path
+                        podcast_categories = [
+                            (int(cat_id_str), cat_name) for cat_id_str, cat_name in categories_dict.items()
+                            if cat_id_str and cat_name and cat_id_str.isdecimal()
+                        ]
+                        category_rows.extend(podcast_categories)
+                        pc_link_rows.extend((feed_id, cat_id) for cat_id, _ in podcast_categories)
+
+                        invalid_count = sum(1 for cat_id_str, cat_name in categories_dict.items() if cat_id_str and cat_name) - len(podcast_categories)
+                        if invalid_count:
+                            category_link_errors += invalid_count
+                            logging.warning(f"Skipped {invalid_count} categories with an invalid ID format for podcast {feed_id}.")
+                    else:
                          logging.debug(f"No categories found or invalid format for podcast {feed_id}.")
 
-                    conn.commit() # Commit all changes for this podcast
-                    logging.info(f"### SUCCESS: Updated details and categories in DB for Feed ID: {feed_id} ('{title}') ###")
-
-                except sqlite3.Error as e:
-                    update_errors += 1
-                    logging.error(f"!!! DATABASE ERROR processing main podcast data for Feed ID {feed_id} ('{title}'): {e} !!!")
-                    if conn: conn.rollback() # Rollback this specific podcast's transaction
-
-            else:
-                 logging.warning(f"--- FAILED: Could not retrieve full details for '{title}' (Candidate ID: {candidate_feed_id}) ---")
+                    if len(podcast_rows) >= DB_WRITE_BATCH_SIZE:
+                        update_errors += write_podcast_batch(conn, podcast_rows, category_rows, pc_link_rows, cache_rows)
+                        podcast_rows, category_rows, pc_link_rows, cache_rows = [], [], [], []
 
+                else:
+                     logging.warning(f"--- FAILED: Could not retrieve full details for '{title}' (Candidate ID: {candidate.get('id')}) ---")
 
-            # API Rate Limiting
-            time.sleep(1.5) # Pause between processing different podcasts
+        update_errors += write_podcast_batch(conn, podcast_rows, category_rows, pc_link_rows, cache_rows) # Last partial batch
 
 
     # --- Catch potential errors from the entire process ---